@@ -8,15 +8,20 @@ Flask应用V3版本主程序
 
 import os
 import sys
+import hmac
 import json
 import time
+import asyncio
+import queue
+import atexit
 import logging
 import logging.config
-import traceback
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 from functools import wraps
 from pathlib import Path
-from threading import Lock
+from threading import Lock, Thread
 from typing import Dict, List, Optional, Union, Any
 
 # 导入Flask相关库
@@ -24,15 +29,39 @@ from flask import (
     Flask, request, jsonify, render_template, 
     send_from_directory, abort, Response, g
 )
+from flask.json.provider import JSONProvider
+
+# 导入JSON序列化与请求校验库
+import orjson
+import msgspec
+
+# 导入缓存
+from cachetools import TTLCache
 
 # 导入Playwright
-from playwright.sync_api import sync_playwright, Browser, Page, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright, Browser, Page, TimeoutError as PlaywrightTimeoutError
 
 # 导入配置
 import config_v3 as config
 
 # 配置日志
 logging.config.dictConfig(config.LOGGING_CONFIG)
+
+def start_log_listener() -> QueueListener:
+    """将已配置的日志处理器移到后台线程，请求线程只把日志记录放入队列"""
+    root_logger = logging.getLogger()
+    handlers = tuple(root_logger.handlers)
+    queue_handler = QueueHandler(queue.Queue(-1))
+    
+    for name in config.LOGGING_CONFIG['loggers']:
+        logging.getLogger(name).handlers = [queue_handler]
+    
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+log_listener = start_log_listener()
 logger = logging.getLogger(__name__)
 
 # 创建Flask应用
@@ -45,53 +74,189 @@ app = Flask(
 # 应用Flask配置
 app.config.update(config.FLASK_CONFIG)
 
+# 使用orjson作为JSON序列化实现
+class OrjsonProvider(JSONProvider):
+    """基于orjson的JSON提供者，加速jsonify和请求体解析"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app.json = OrjsonProvider(app)
+
+def jresp(data, code=200):
+    """直接用orjson序列化构造JSON响应，跳过jsonify的提供者调用链"""
+    return Response(orjson.dumps(data), status=code, mimetype='application/json')
+
+# 拦截的资源类型
+BLOCKED_RESOURCE_TYPES = frozenset(config.PLAYWRIGHT_CONFIG['blocked_resource_types'])
+
+# 数值文本清理表：一次遍历去除千分位、货币和百分号
+_NUM_TBL = str.maketrans('', '', ',¥')
+_PCT_TBL = str.maketrans('', '', ',%')
+
+# 在页面中批量提取数据的脚本
+EXTRACT_STATS_JS = """() => {
+    const text = (selector) => {
+        const node = document.querySelector(selector);
+        return node ? node.textContent : null;
+    };
+    return {
+        total_count: text('#total-count'),
+        total_amount: text('#total-amount'),
+        average_amount: text('#average-amount'),
+        success_rate: text('#success-rate'),
+    };
+}"""
+
+# 表格提取时在页面内解析金额并按利润系数计算利润，参数为[高值系数, 低值系数, 默认系数]
+# 金额无法解析时抛出异常，查询失败而不是返回虚假的0
+EXTRACT_ROWS_JS = """([hi, lo, dflt]) => {
+    const rows = document.querySelectorAll('#results-table tbody tr');
+    const data = [];
+    for (const row of rows) {
+        const cells = row.querySelectorAll('td');
+        if (cells.length >= 5) {
+            const text = (i) => (cells[i].textContent || '').trim();
+            // 与float()一致：金额为空或包含多余字符时报错，不把无法解析的金额当作0
+            const raw = text(2).replace(/[¥,]/g, '');
+            const amount = raw === '' ? NaN : Number(raw);
+            if (!Number.isFinite(amount)) {
+                throw new Error(`无法解析金额: ${text(2)}`);
+            }
+            data.push({
+                id: text(0),
+                date: text(1),
+                amount: amount,
+                status: text(3),
+                details: text(4),
+                profit: amount * (amount > 10000 ? hi : (amount < 1000 ? lo : dflt)),
+            });
+        }
+    }
+    return data;
+}"""
+
+# 浏览器存储状态文件及最小保存间隔（秒）
+STORAGE_STATE_PATH = Path(config.PROJECT_PATHS['temp_dir']) / 'state.json'
+STORAGE_STATE_INTERVAL = 300
+
+# 预期的API凭据（auth_key, app_id）
+_EXPECTED_AUTH = (config.DEFAULT_AUTH_KEY.encode(), config.DEFAULT_APP_ID.encode())
+
 # 全局变量
 playwright_instance = None
 browser_instance = None
-browser_lock = Lock()
+browser_lock = None  # asyncio.Lock，在Playwright事件循环中创建
+playwright_loop = None
+loop_lock = Lock()
+
+# 浏览器上下文池：空闲上下文列表，借出数量由context_slots限制
+context_pool = []
+context_slots = None  # asyncio.Semaphore，在Playwright事件循环中创建
+last_state_save = None  # 上次保存存储状态的时间，None表示尚未保存
+saved_state = None  # 内存中的浏览器存储状态（cookies和本地存储），启动事件循环时从文件读取一次
+
+# 健康检查：缓存的浏览器连接状态[检查时间, 是否连接]及恢复锁
+HEALTH_CHECK_TTL = 5
+last_health = [0.0, False]
+recovery_lock = Lock()
 
-# 缓存
-query_cache = {}
+# 缓存（LRU+TTL，容量上限为CACHE_CONFIG['threshold']）
+query_cache = TTLCache(
+    maxsize=config.CACHE_CONFIG['threshold'],
+    ttl=config.CACHE_CONFIG['timeout'],
+    timer=time.monotonic,
+)
 cache_lock = Lock()
 
+# 按缓存键的锁，防止同一键并发未命中时重复查询：cache_key -> (Lock, 等待者数量)
+_key_locks = {}
+_MISSING = object()
+
+# Playwright事件循环
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """获取Playwright专用事件循环，首次调用时在后台线程中启动
+
+    所有浏览器操作都在该事件循环中执行，多个请求的页面可以在同一个浏览器上并发运行。
+    """
+    global playwright_loop, browser_lock, context_slots, saved_state
+    
+    if playwright_loop is None:
+        with loop_lock:
+            if playwright_loop is None:
+                # 在事件循环之外读取一次存储状态文件，文件不存在时不再重试
+                saved_state = _load_storage_state()
+                loop = asyncio.new_event_loop()
+                browser_lock, context_slots = loop.run_until_complete(_create_primitives())
+                Thread(target=loop.run_forever, name='playwright-loop', daemon=True).start()
+                playwright_loop = loop
+    return playwright_loop
+
+async def _create_primitives():
+    """在事件循环内创建浏览器锁和上下文池信号量"""
+    return asyncio.Lock(), asyncio.Semaphore(config.PERFORMANCE['connection_pool_size'])
+
+def run_in_loop(coro):
+    """在Playwright事件循环中执行协程，阻塞当前线程直到返回结果"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
 # 初始化Playwright
-def init_playwright() -> None:
-    """初始化Playwright和浏览器实例"""
+async def _init_playwright() -> None:
+    """初始化Playwright和浏览器实例，调用方需持有browser_lock"""
     global playwright_instance, browser_instance
     
-    if playwright_instance is None:
-        try:
+    if browser_instance is not None and browser_instance.is_connected():
+        return
+    
+    try:
+        if playwright_instance is None:
             logger.info("初始化Playwright...")
-            playwright_instance = sync_playwright().start()
-            
-            # 创建浏览器实例
-            browser_type = getattr(playwright_instance, config.PLAYWRIGHT_CONFIG['browser_type'])
-            browser_instance = browser_type.launch(
-                headless=config.PLAYWRIGHT_CONFIG['headless'],
-                slow_mo=config.PLAYWRIGHT_CONFIG['slow_mo'],
-                timeout=config.PLAYWRIGHT_CONFIG['timeout'],
-                args=config.CHROME_OPTIONS,
-                ignore_default_args=['--enable-automation'],
-                downloads_path=config.PLAYWRIGHT_CONFIG['downloads_path'],
-            )
-            
-            logger.info(f"Playwright和{config.PLAYWRIGHT_CONFIG['browser_type']}浏览器初始化成功")
-        except Exception as e:
-            logger.error(f"初始化Playwright失败: {e}")
-            if playwright_instance:
-                playwright_instance.stop()
-                playwright_instance = None
-            raise
+            playwright_instance = await async_playwright().start()
+        
+        # 创建浏览器实例
+        browser_type = getattr(playwright_instance, config.PLAYWRIGHT_CONFIG['browser_type'])
+        browser_instance = await browser_type.launch(
+            headless=config.PLAYWRIGHT_CONFIG['headless'],
+            slow_mo=config.PLAYWRIGHT_CONFIG['slow_mo'],
+            timeout=config.PLAYWRIGHT_CONFIG['timeout'],
+            args=list(config.CHROME_OPTIONS),
+            ignore_default_args=['--enable-automation'],
+            downloads_path=config.PLAYWRIGHT_CONFIG['downloads_path'],
+        )
+        
+        logger.info(f"Playwright和{config.PLAYWRIGHT_CONFIG['browser_type']}浏览器初始化成功")
+    except Exception as e:
+        logger.error(f"初始化Playwright失败: {e}")
+        browser_instance = None
+        if playwright_instance:
+            await playwright_instance.stop()
+            playwright_instance = None
+        raise
+
+async def _init_playwright_locked() -> None:
+    """持有browser_lock初始化Playwright"""
+    async with browser_lock:
+        await _init_playwright()
+
+def init_playwright() -> None:
+    """初始化Playwright和浏览器实例（同步入口）"""
+    run_in_loop(_init_playwright_locked())
 
 # 关闭Playwright
-def close_playwright() -> None:
+async def _close_playwright() -> None:
     """关闭Playwright和浏览器实例"""
     global playwright_instance, browser_instance
     
-    with browser_lock:
+    async with browser_lock:
+        # 池中的上下文随浏览器一起关闭
+        context_pool.clear()
+        
         if browser_instance:
             try:
-                browser_instance.close()
+                await browser_instance.close()
             except Exception as e:
                 logger.error(f"关闭浏览器实例失败: {e}")
             finally:
@@ -99,59 +264,182 @@ def close_playwright() -> None:
         
         if playwright_instance:
             try:
-                playwright_instance.stop()
+                await playwright_instance.stop()
             except Exception as e:
                 logger.error(f"关闭Playwright实例失败: {e}")
             finally:
                 playwright_instance = None
 
+def close_playwright() -> None:
+    """关闭Playwright和浏览器实例（同步入口）"""
+    if playwright_loop is not None:
+        run_in_loop(_close_playwright())
+
 # 获取浏览器上下文
-def get_browser_context():
-    """获取浏览器上下文，如果需要则初始化Playwright"""
-    global browser_instance
+async def get_browser_context():
+    """获取浏览器上下文，如果需要则初始化Playwright
+
+    浏览器已连接时不获取browser_lock，只有初始化路径才加锁（双重检查）。
+    """
+    pw_cfg = config.PLAYWRIGHT_CONFIG
+    
+    browser = browser_instance
+    if browser is None or not browser.is_connected():
+        async with browser_lock:
+            await _init_playwright()
+        browser = browser_instance
     
-    with browser_lock:
-        if browser_instance is None or not browser_instance.is_connected():
-            init_playwright()
+    # 复用上次保存的cookies和本地存储，减少重新登录和会话建立
+    context = await browser.new_context(
+        viewport=pw_cfg['viewport'],
+        user_agent=pw_cfg['user_agent'],
+        ignore_https_errors=pw_cfg['ignore_https_errors'],
+        java_script_enabled=pw_cfg['java_script_enabled'],
+        storage_state=saved_state,
+    )
+    
+    # 拦截与表单和结果表格无关的资源
+    await context.route('**/*', _block_resources)
+    return context
+
+async def _block_resources(route) -> None:
+    """中止图片、字体等无关资源的请求，其余请求正常放行"""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+# 读取浏览器存储状态
+def _load_storage_state():
+    """读取上次保存的存储状态，文件不存在或内容无效时返回None"""
+    try:
+        with open(STORAGE_STATE_PATH, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+def _write_storage_state(state) -> None:
+    """原子写入存储状态文件：先写临时文件再替换，其他worker不会读到写了一半的文件"""
+    tmp_path = STORAGE_STATE_PATH.with_name(f'{STORAGE_STATE_PATH.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(state))
+    os.replace(tmp_path, STORAGE_STATE_PATH)
+
+# 保存浏览器存储状态
+async def _save_storage_state(context) -> None:
+    """保存上下文的cookies和本地存储，供新建上下文复用，每STORAGE_STATE_INTERVAL秒最多保存一次"""
+    global last_state_save, saved_state
+    
+    now = time.monotonic()
+    if last_state_save is not None and now - last_state_save < STORAGE_STATE_INTERVAL:
+        return
+    last_state_save = now
+    
+    try:
+        state = await context.storage_state()
+        saved_state = state
+        await asyncio.get_running_loop().run_in_executor(None, _write_storage_state, state)
+    except Exception as e:
+        logger.warning(f"保存浏览器存储状态失败: {e}")
+
+def _local_storage_snapshot(state) -> dict:
+    """把存储状态中的localStorage整理为{origin: 键值集合}，便于比较"""
+    return {
+        origin['origin']: frozenset((item['name'], item['value']) for item in origin['localStorage'])
+        for origin in (state or {}).get('origins', ())
+        if origin.get('localStorage')
+    }
+
+# 借用池化的浏览器上下文
+@asynccontextmanager
+async def pooled_context():
+    """从上下文池借出浏览器上下文，用完后重置为保存的cookies归还而不是关闭
+
+    池中上下文在首次需要时创建，浏览器重启后旧上下文会被丢弃。
+    查询写入过localStorage的上下文直接关闭，不会带入下一次查询；
+    sessionStorage属于页面，随查询结束时关闭页面一起清除。
+    """
+    async with context_slots:
+        context = None
+        while context_pool:
+            candidate = context_pool.pop()
+            if candidate.browser is browser_instance and browser_instance.is_connected():
+                context = candidate
+                break
+        if context is None:
+            context = await get_browser_context()
         
-        return browser_instance.new_context(
-            viewport=config.PLAYWRIGHT_CONFIG['viewport'],
-            user_agent=config.PLAYWRIGHT_CONFIG['user_agent'],
-            ignore_https_errors=config.PLAYWRIGHT_CONFIG['ignore_https_errors'],
-            java_script_enabled=config.PLAYWRIGHT_CONFIG['java_script_enabled'],
-        )
+        try:
+            yield context
+        finally:
+            # 归还上下文，浏览器已重启或清理失败时直接关闭
+            try:
+                if context.browser is not browser_instance or not browser_instance.is_connected():
+                    raise RuntimeError("浏览器上下文已失效")
+                state = await context.storage_state()
+                if _local_storage_snapshot(state) != _local_storage_snapshot(saved_state):
+                    raise RuntimeError("浏览器上下文的localStorage已改变")
+                await context.clear_cookies()
+                # 恢复保存的cookies，使复用的上下文同样保持会话
+                if saved_state and saved_state.get('cookies'):
+                    await context.add_cookies(saved_state['cookies'])
+                context_pool.append(context)
+            except Exception:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.debug(f"关闭浏览器上下文失败: {e}")
 
 # 缓存装饰器
-def cache_result(timeout=config.CACHE_CONFIG['timeout']):
-    """缓存查询结果的装饰器"""
+def cache_result(cache=query_cache):
+    """缓存查询结果的装饰器，过期与容量淘汰由TTLCache负责
+
+    同一缓存键的并发未命中只会执行一次被装饰函数，其余调用等待并复用结果。
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             # 生成缓存键
-            cache_key = f"{func.__name__}:{str(args)}:{str(kwargs)}"
+            cache_key = (func.__name__, args, tuple(sorted(kwargs.items())))
             
+            # 检查缓存（TTLCache在访问时惰性清理过期项），未命中时获取该键的锁
             with cache_lock:
-                # 检查缓存
-                if cache_key in query_cache:
-                    result, timestamp = query_cache[cache_key]
-                    if time.time() - timestamp < timeout:
+                try:
+                    result = cache[cache_key]
+                except KeyError:
+                    key_lock, waiters = _key_locks.get(cache_key, (None, 0))
+                    if key_lock is None:
+                        key_lock = Lock()
+                    _key_locks[cache_key] = (key_lock, waiters + 1)
+                else:
+                    logger.info(f"从缓存返回结果: {cache_key}")
+                    return result
+            
+            try:
+                with key_lock:
+                    # 再次检查缓存，可能已由持锁的调用方写入
+                    with cache_lock:
+                        result = cache.get(cache_key, _MISSING)
+                    if result is not _MISSING:
                         logger.info(f"从缓存返回结果: {cache_key}")
                         return result
-            
-            # 执行函数
-            result = func(*args, **kwargs)
-            
-            # 更新缓存
-            with cache_lock:
-                query_cache[cache_key] = (result, time.time())
-                
-                # 清理过期缓存
-                current_time = time.time()
-                expired_keys = [k for k, (_, t) in query_cache.items() if current_time - t > timeout]
-                for k in expired_keys:
-                    del query_cache[k]
-            
-            return result
+                    
+                    # 执行函数
+                    result = func(*args, **kwargs)
+                    
+                    # 更新缓存
+                    with cache_lock:
+                        cache[cache_key] = result
+                    
+                    return result
+            finally:
+                # 最后一个等待者移除键锁
+                with cache_lock:
+                    key_lock, waiters = _key_locks[cache_key]
+                    if waiters <= 1:
+                        del _key_locks[cache_key]
+                    else:
+                        _key_locks[cache_key] = (key_lock, waiters - 1)
         return wrapper
     return decorator
 
@@ -164,36 +452,51 @@ def error_handler(func):
             return func(*args, **kwargs)
         except PlaywrightTimeoutError as e:
             logger.error(f"Playwright超时错误: {e}")
-            return jsonify({
+            return jresp({
                 'status': 'error',
                 'error_type': 'timeout',
                 'message': f'浏览器操作超时: {str(e)}',
                 'timestamp': datetime.now().isoformat()
-            }), 408
+            }, 408)
         except Exception as e:
-            logger.error(f"处理请求时出错: {e}")
-            logger.error(traceback.format_exc())
-            return jsonify({
+            logger.exception(f"处理请求时出错: {e}")
+            return jresp({
                 'status': 'error',
                 'error_type': 'server_error',
                 'message': f'服务器内部错误: {str(e)}',
                 'timestamp': datetime.now().isoformat()
-            }), 500
+            }, 500)
     return wrapper
 
+# 查询请求参数
+class QueryRequest(msgspec.Struct):
+    """/api/query请求体"""
+    project_id: str
+    uk_code: str
+    start_date: str
+    end_date: str
+    auth_key: str = config.DEFAULT_AUTH_KEY
+    app_id: str = config.DEFAULT_APP_ID
+
 # 验证API密钥
 def validate_api_key(auth_key, app_id):
     """验证API密钥"""
     # 在实际应用中，这里应该查询数据库或调用认证服务
     # 这里简化为检查是否与配置中的默认值匹配
-    return auth_key == config.DEFAULT_AUTH_KEY and app_id == config.DEFAULT_APP_ID
+    # 使用常量时间比较，按位与保证两项都参与比较
+    return hmac.compare_digest(str(auth_key).encode(), _EXPECTED_AUTH[0]) & hmac.compare_digest(str(app_id).encode(), _EXPECTED_AUTH[1])
 
 # 查询数据
-@cache_result(timeout=config.CACHE_CONFIG['timeout'])
-def query_data(project_id, uk_code, start_date, end_date):
+async def _query_data(project_id, uk_code, start_date, end_date):
     """使用Playwright查询数据"""
     logger.info(f"查询数据: project_id={project_id}, uk_code={uk_code}, 日期范围={start_date}至{end_date}")
     
+    # 缓存配置项到局部变量
+    timeout = config.PLAYWRIGHT_CONFIG['timeout']
+    url = config.BASE_URL
+    coeffs = config.PROFIT_COEFFICIENTS
+    hi, lo, dflt = coeffs['high_value'], coeffs['low_value'], coeffs['default']
+    
     results = []
     total_stats = {
         'total_count': 0,
@@ -204,76 +507,57 @@ def query_data(project_id, uk_code, start_date, end_date):
     
     try:
         # 获取浏览器上下文
-        with get_browser_context() as context:
+        async with pooled_context() as context:
             # 创建新页面
-            page = context.new_page()
+            page = await context.new_page()
             
             try:
                 # 导航到目标网站
-                page.goto(config.BASE_URL, timeout=config.PLAYWRIGHT_CONFIG['timeout'])
+                await page.goto(url, timeout=timeout)
                 
-                # 等待页面加载
-                page.wait_for_load_state('networkidle')
+                # 等待查询表单出现（不等待networkidle，避免被无关请求拖慢）
+                await page.wait_for_selector('#project-id-input', state='attached')
                 
                 # 填写查询表单
-                page.fill('#project-id-input', project_id)
-                page.fill('#uk-code-input', uk_code)
-                page.fill('#start-date-input', start_date)
-                page.fill('#end-date-input', end_date)
+                await page.fill('#project-id-input', project_id)
+                await page.fill('#uk-code-input', uk_code)
+                await page.fill('#start-date-input', start_date)
+                await page.fill('#end-date-input', end_date)
                 
                 # 提交表单
-                page.click('#query-button')
+                await page.click('#query-button')
                 
                 # 等待结果加载
-                page.wait_for_selector('#results-table', timeout=config.PLAYWRIGHT_CONFIG['timeout'])
+                await page.wait_for_selector('#results-table', timeout=timeout)
                 
-                # 提取总计统计信息
-                total_count_text = page.text_content('#total-count')
-                total_amount_text = page.text_content('#total-amount')
-                average_amount_text = page.text_content('#average-amount')
-                success_rate_text = page.text_content('#success-rate')
+                # 一次evaluate提取全部统计信息
+                stats_text = await page.evaluate(EXTRACT_STATS_JS)
+                total_count_text = stats_text['total_count']
+                total_amount_text = stats_text['total_amount']
+                average_amount_text = stats_text['average_amount']
+                success_rate_text = stats_text['success_rate']
                 
                 # 解析统计信息
                 total_stats = {
-                    'total_count': int(total_count_text.strip().replace(',', '')) if total_count_text else 0,
-                    'total_amount': float(total_amount_text.strip().replace(',', '').replace('¥', '')) if total_amount_text else 0,
-                    'average_amount': float(average_amount_text.strip().replace(',', '').replace('¥', '')) if average_amount_text else 0,
-                    'success_rate': float(success_rate_text.strip().replace('%', '')) / 100 if success_rate_text else 0
+                    'total_count': int(total_count_text.translate(_NUM_TBL).strip() or '0') if total_count_text else 0,
+                    'total_amount': float(total_amount_text.translate(_NUM_TBL).strip() or '0') if total_amount_text else 0,
+                    'average_amount': float(average_amount_text.translate(_NUM_TBL).strip() or '0') if average_amount_text else 0,
+                    'success_rate': float(success_rate_text.translate(_PCT_TBL).strip() or '0') / 100 if success_rate_text else 0
                 }
                 
-                # 提取表格数据
-                rows = page.query_selector_all('#results-table tbody tr')
-                
-                for row in rows:
-                    cells = row.query_selector_all('td')
-                    if len(cells) >= 5:
-                        result = {
-                            'id': cells[0].text_content().strip(),
-                            'date': cells[1].text_content().strip(),
-                            'amount': float(cells[2].text_content().strip().replace(',', '').replace('¥', '')),
-                            'status': cells[3].text_content().strip(),
-                            'details': cells[4].text_content().strip()
-                        }
-                        results.append(result)
+                # 一次evaluate提取整个表格并计算利润，避免逐行逐单元格的往返调用
+                results = await page.evaluate(EXTRACT_ROWS_JS, [hi, lo, dflt])
                 
                 logger.info(f"查询成功，获取到{len(results)}条记录")
+                
+                await _save_storage_state(context)
             finally:
                 # 关闭页面
-                page.close()
+                await page.close()
     except Exception as e:
-        logger.error(f"查询数据时出错: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception(f"查询数据时出错: {e}")
         raise
     
-    # 应用利润系数（示例业务逻辑）
-    for result in results:
-        if result['amount'] > 10000:
-            result['profit'] = result['amount'] * config.PROFIT_COEFFICIENTS['high_value']
-        elif result['amount'] < 1000:
-            result['profit'] = result['amount'] * config.PROFIT_COEFFICIENTS['low_value']
-        else:
-            result['profit'] = result['amount'] * config.PROFIT_COEFFICIENTS['default']
-    
     return {
         'status': 'success',
         'data': results,
@@ -287,6 +571,11 @@ def query_data(project_id, uk_code, start_date, end_date):
         }
     }
 
+@cache_result(query_cache)
+def query_data(project_id, uk_code, start_date, end_date):
+    """查询数据，在Playwright事件循环中执行，多个请求可并发共享同一浏览器"""
+    return run_in_loop(_query_data(project_id, uk_code, start_date, end_date))
+
 # 路由：首页
 @app.route('/')
 def index():
@@ -298,61 +587,60 @@ def index():
 @error_handler
 def api_query():
     """API查询接口"""
-    # 获取请求数据
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({
+    # 解析并校验请求数据（JSON解码与字段校验一次完成）
+    try:
+        req = msgspec.json.decode(request.get_data(cache=False), type=QueryRequest)
+    except msgspec.ValidationError:
+        req = None
+    except msgspec.DecodeError:
+        return jresp({
             'status': 'error',
             'error_type': 'invalid_request',
             'message': '无效的请求数据',
             'timestamp': datetime.now().isoformat()
-        }), 400
-    
-    # 提取参数
-    project_id = data.get('project_id')
-    uk_code = data.get('uk_code')
-    start_date = data.get('start_date')
-    end_date = data.get('end_date')
-    auth_key = data.get('auth_key', config.DEFAULT_AUTH_KEY)
-    app_id = data.get('app_id', config.DEFAULT_APP_ID)
+        }, 400)
     
     # 验证参数
-    if not all([project_id, uk_code, start_date, end_date]):
-        return jsonify({
+    if req is None or not all((req.project_id, req.uk_code, req.start_date, req.end_date)):
+        return jresp({
             'status': 'error',
             'error_type': 'missing_parameters',
             'message': '缺少必要参数',
             'timestamp': datetime.now().isoformat()
-        }), 400
+        }, 400)
     
     # 验证API密钥
-    if not validate_api_key(auth_key, app_id):
-        return jsonify({
+    if not validate_api_key(req.auth_key, req.app_id):
+        return jresp({
             'status': 'error',
             'error_type': 'unauthorized',
             'message': '未授权的访问',
             'timestamp': datetime.now().isoformat()
-        }), 401
+        }, 401)
     
     # 查询数据
     try:
-        result = query_data(project_id, uk_code, start_date, end_date)
+        result = query_data(req.project_id, req.uk_code, req.start_date, req.end_date)
         return jsonify(result)
     except Exception as e:
         logger.error(f"API查询失败: {e}")
-        return jsonify({
+        return jresp({
             'status': 'error',
             'error_type': 'query_failed',
             'message': f'查询失败: {str(e)}',
             'timestamp': datetime.now().isoformat()
-        }), 500
+        }, 500)
 
 # 路由：健康检查
 @app.route('/health')
 def health_check():
-    """健康检查接口"""
-    global browser_instance
+    """健康检查接口，浏览器连接状态在HEALTH_CHECK_TTL秒内复用上次结果"""
+    now = time.monotonic()
+    if now - last_health[0] < HEALTH_CHECK_TTL:
+        browser_connected = last_health[1]
+    else:
+        browser_connected = browser_instance is not None and browser_instance.is_connected()
+        last_health[:] = [now, browser_connected]
     
     health_status = {
         'status': 'healthy',
@@ -367,47 +655,59 @@ def health_check():
         },
         'components': {
             'flask': 'ok',
-            'playwright': 'ok' if browser_instance and browser_instance.is_connected() else 'error',
+            'playwright': 'ok' if browser_connected else 'error',
         }
     }
     
-    # 如果浏览器实例有问题，尝试重新初始化
+    # 如果浏览器实例有问题，尝试重新初始化（同一时间只允许一个请求执行恢复）
     if health_status['components']['playwright'] == 'error':
-        try:
-            with browser_lock:
-                close_playwright()
-                init_playwright()
-            health_status['components']['playwright'] = 'recovered'
-        except Exception as e:
+        if recovery_lock.acquire(blocking=False):
+            try:
+                # 缓存的状态可能已过时：查询期间浏览器可能已被重新启动，此时不能关闭它
+                if browser_instance is not None and browser_instance.is_connected():
+                    last_health[:] = [time.monotonic(), True]
+                    health_status['components']['playwright'] = 'ok'
+                else:
+                    close_playwright()
+                    init_playwright()
+                    last_health[:] = [time.monotonic(), True]
+                    health_status['components']['playwright'] = 'recovered'
+            except Exception as e:
+                health_status['status'] = 'degraded'
+                health_status['components']['playwright'] = f'failed: {str(e)}'
+            finally:
+                recovery_lock.release()
+        else:
             health_status['status'] = 'degraded'
-            health_status['components']['playwright'] = f'failed: {str(e)}'
+            health_status['components']['playwright'] = 'recovering'
     
     status_code = 200 if health_status['status'] == 'healthy' else 500
-    return jsonify(health_status), status_code
+    return jresp(health_status, status_code)
 
-# 应用启动和关闭事件
-@app.before_first_request
-def before_first_request():
-    """应用首次请求前的初始化"""
+# 应用工厂
+def create_app():
+    """创建应用并初始化资源，供gunicorn在每个worker中调用一次：gunicorn 'app_v3:create_app()'"""
     logger.info("应用启动，初始化资源...")
     try:
         init_playwright()
     except Exception as e:
         logger.error(f"初始化Playwright失败: {e}")
-
-@app.teardown_appcontext
-def teardown_appcontext(exception):
-    """应用上下文结束时的清理"""
-    pass
+    return app
 
 # 应用关闭时的清理
 def cleanup():
     """应用关闭时的资源清理"""
+    global playwright_loop
+    
     logger.info("应用关闭，清理资源...")
     close_playwright()
+    
+    # 停止Playwright事件循环
+    if playwright_loop is not None:
+        playwright_loop.call_soon_threadsafe(playwright_loop.stop)
+        playwright_loop = None
 
 # 注册清理函数
-import atexit
 atexit.register(cleanup)
 
 # 主函数
@@ -423,8 +723,7 @@ if __name__ == '__main__':
             debug=config.CURRENT_ENV_CONFIG.get('DEBUG', False)
         )
     except Exception as e:
-        logger.error(f"应用启动失败: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception(f"应用启动失败: {e}")
     finally:
         # 清理资源
         cleanup()
\ No newline at end of file
@@ -6,9 +6,9 @@ V3版本配置文件
 """
 
 import os
-import platform
+import re
 import socket
-import multiprocessing
+from functools import lru_cache
 from pathlib import Path
 
 # 基础路径配置
@@ -51,10 +51,21 @@ PROJECT_PATHS = {
 }
 
 # 性能配置
+@lru_cache(maxsize=None)
 def get_system_memory_gb():
     """获取系统内存大小（GB）"""
+    # 优先使用psutil，未安装时回退到平台相关的实现
     try:
-        if platform.system().lower() == 'windows':
+        import psutil
+        return psutil.virtual_memory().total / (1024**3)
+    except Exception:
+        pass
+    
+    import platform
+    
+    try:
+        system = platform.system().lower()
+        if system == 'windows':
             import ctypes
             kernel32 = ctypes.windll.kernel32
             c_ulonglong = ctypes.c_ulonglong
@@ -75,12 +86,13 @@ def get_system_memory_gb():
             memory_status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
             kernel32.GlobalMemoryStatusEx(ctypes.byref(memory_status))
             return memory_status.ullTotalPhys / (1024**3)
-        elif platform.system().lower() == 'linux':
+        elif system == 'linux':
+            # MemTotal位于/proc/meminfo开头，只读取前1KB
             with open('/proc/meminfo', 'r') as f:
-                for line in f:
-                    if 'MemTotal' in line:
-                        return int(line.split()[1]) / (1024**2)
-        elif platform.system().lower() == 'darwin':
+                match = _MEMTOTAL_RE.search(f.read(1024))
+            if match:
+                return int(match.group(1)) / (1024**2)
+        elif system == 'darwin':
             import subprocess
             result = subprocess.run(['sysctl', '-n', 'hw.memsize'], capture_output=True, text=True)
             if result.returncode == 0:
@@ -91,7 +103,10 @@ def get_system_memory_gb():
     # 如果无法获取，返回默认值
     return 4.0
 
+_MEMTOTAL_RE = re.compile(r'^MemTotal:\s+(\d+)', re.MULTILINE)
+
 # 检测是否在Docker容器中运行
+@lru_cache(maxsize=None)
 def is_running_in_docker():
     """检测是否在Docker容器中运行"""
     try:
@@ -104,15 +119,22 @@ def is_running_in_docker():
             return False
 
 # 系统信息
-SYSTEM_INFO = {
-    'os': platform.system(),
-    'os_version': platform.version(),
-    'python_version': platform.python_version(),
-    'hostname': socket.gethostname(),
-    'cpu_count': multiprocessing.cpu_count(),
-    'memory_gb': get_system_memory_gb(),
-    'is_docker': is_running_in_docker(),
-}
+def collect_system_info():
+    """采集系统信息，内存和Docker检测由带缓存的辅助函数提供"""
+    import platform
+    import multiprocessing
+    
+    return {
+        'os': platform.system(),
+        'os_version': platform.release(),
+        'python_version': platform.python_version(),
+        'hostname': socket.gethostname(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'memory_gb': get_system_memory_gb(),
+        'is_docker': is_running_in_docker(),
+    }
+
+SYSTEM_INFO = collect_system_info()
 
 # 根据系统资源自动调整性能参数
 IS_LOW_SPEC = SYSTEM_INFO['cpu_count'] <= 1 or SYSTEM_INFO['memory_gb'] < 4
@@ -151,10 +173,11 @@ PLAYWRIGHT_CONFIG = {
     'user_agent': BROWSER_CONFIG['user_agent'],
     'downloads_path': str(TEMP_DIR / 'downloads'),
     'proxy': None,  # 代理配置，格式：{'server': 'http://myproxy.com:3128', 'username': 'user', 'password': 'pass'}
+    'blocked_resource_types': ['image', 'media', 'font', 'stylesheet'],  # 拦截的资源类型，减少页面加载流量
 }
 
-# Chrome选项
-CHROME_OPTIONS = [
+# Chrome选项（不可变元组，导入时确定）
+_BASE_CHROME_OPTIONS = (
     '--no-sandbox',
     '--disable-dev-shm-usage',
     '--disable-gpu',
@@ -189,21 +212,22 @@ CHROME_OPTIONS = [
     '--enable-logging',
     '--log-level=0',
     '--window-size=1280,720',
-]
+)
+
+# 低配置模式的额外优化选项
+_LOW_SPEC_CHROME_OPTIONS = (
+    '--js-flags=--expose-gc',
+    '--single-process',
+    '--memory-pressure-off',
+    '--disable-software-rasterizer',
+    '--disable-logging',
+    '--disable-3d-apis',
+    '--disable-canvas-aa',
+    '--disable-2d-canvas-clip-aa',
+    '--disable-gl-drawing-for-tests',
+)
 
-# 如果是低配置模式，添加额外的优化选项
-if IS_LOW_SPEC:
-    CHROME_OPTIONS.extend([
-        '--js-flags=--expose-gc',
-        '--single-process',
-        '--memory-pressure-off',
-        '--disable-software-rasterizer',
-        '--disable-logging',
-        '--disable-3d-apis',
-        '--disable-canvas-aa',
-        '--disable-2d-canvas-clip-aa',
-        '--disable-gl-drawing-for-tests',
-    ])
+CHROME_OPTIONS = _BASE_CHROME_OPTIONS + _LOW_SPEC_CHROME_OPTIONS if IS_LOW_SPEC else _BASE_CHROME_OPTIONS
 
 # 利润系数配置
 PROFIT_COEFFICIENTS = {
@@ -10,13 +10,24 @@ import os
 import sys
 import platform
 import subprocess
+import shlex
+import asyncio
+import hashlib
 import shutil
+import stat
 import json
 import re
+import configparser
 import time
 import logging
 import tempfile
+import unicodedata
+import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
@@ -31,15 +42,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger('install_v3')
 
+# 平台信息快照（只探测一次）
+@dataclass(frozen=True)
+class PlatformInfo:
+    system: str
+    version: str
+    python_version: str
+    is_windows: bool
+    is_linux: bool
+    is_mac: bool
+
+def _platform_info():
+    """探测平台信息"""
+    system = platform.system()
+    return PlatformInfo(
+        system=system,
+        version=platform.version(),
+        python_version=platform.python_version(),
+        is_windows=system.lower() == 'windows',
+        is_linux=system.lower() == 'linux',
+        is_mac=system.lower() == 'darwin',
+    )
+
+PLATFORM = _platform_info()
+
 # 全局变量
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 VENV_DIR = os.path.join(PROJECT_ROOT, 'venv')
 PIP_CONF_PATH = os.path.expanduser('~/.pip/pip.conf')
-IS_WINDOWS = platform.system().lower() == 'windows'
-IS_LINUX = platform.system().lower() == 'linux'
-IS_MAC = platform.system().lower() == 'darwin'
+PIP_CACHE_DIR = os.path.join(PROJECT_ROOT, '.pip-cache')
+UV_CACHE_DIR = os.path.join(PROJECT_ROOT, '.uv-cache')  # uv的缓存格式与pip不同，单独存放
+REQ_HASH_PATH = os.path.join(VENV_DIR, '.req_hash')  # 上次成功安装的依赖文件哈希
+PW_MARKER_PATH = os.path.join(VENV_DIR, '.pw_installed')  # 已安装Playwright浏览器的标记
+ENTRY_MODULES = ('app_v3.py', 'config_v3.py', 'start_app_v3.py')
+DEPS_LOG_PATH = os.path.join(PROJECT_ROOT, 'install_deps_log.txt')  # 依赖安装输出
+PW_LOG_PATH = os.path.join(PROJECT_ROOT, 'install_playwright_log.txt')  # Playwright安装输出
+STREAM_LIMIT = 1024 * 1024  # 子进程输出单行的最大长度（字节）
+IS_WINDOWS = PLATFORM.is_windows
+IS_LINUX = PLATFORM.is_linux
+IS_MAC = PLATFORM.is_mac
 PYTHON_CMD = 'python' if IS_WINDOWS else 'python3'
-PIP_CMD = f'{PYTHON_CMD} -m pip'
+PIP_QUIET_FLAGS = ('--no-input', '--disable-pip-version-check')
 
 # 国内镜像源
 PIP_MIRRORS = {
@@ -50,11 +93,17 @@ PIP_MIRRORS = {
     'default': 'https://pypi.org/simple/'
 }
 
+# 镜像测速：单个请求及整体超时（秒），收到足够数量的响应后停止等待
+MIRROR_PROBE_TIMEOUT = 2
+MIRROR_PROBE_ENOUGH = 2
+MIRROR_PROBE_STAMP_PATH = os.path.join(os.path.dirname(PIP_CONF_PATH), '.last_probe')
+MIRROR_PROBE_MAX_AGE = 7 * 24 * 3600  # 镜像测速结果有效期（秒）
+
 # 系统信息
 SYSTEM_INFO = {
-    'os': platform.system(),
-    'os_version': platform.version(),
-    'python_version': platform.python_version(),
+    'os': PLATFORM.system,
+    'os_version': PLATFORM.version,
+    'python_version': PLATFORM.python_version,
     'cpu_count': os.cpu_count() or 1,
     'memory_gb': None,  # 将在后面计算
     'is_docker': False,  # 将在后面检测
@@ -78,24 +127,48 @@ if IS_WINDOWS and not sys.stdout.isatty():
         if not attr.startswith('__'):
             setattr(Colors, attr, '')
 
+# 横幅边框
+BOX_WIDTH = 63  # 边框内的显示宽度
+
+def _display_width(text):
+    """计算文本在终端中的显示宽度，中文等全角字符占两列"""
+    return sum(2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1 for ch in text)
+
+def _box_line(text='', color='', indent=2):
+    """生成一行边框内容，按显示宽度补齐右侧边框"""
+    if not text:
+        return f"║{' ' * BOX_WIDTH}║"
+    padding = ' ' * max(BOX_WIDTH - indent - _display_width(text), 0)
+    if color:
+        return f"║{' ' * indent}{color}{text}{Colors.BLUE}{padding}║"
+    return f"║{' ' * indent}{text}{padding}║"
+
+def _box(lines):
+    """用边框包围多行内容"""
+    return "\n".join([
+        f"{Colors.BLUE}╔{'═' * BOX_WIDTH}╗",
+        *lines,
+        f"╚{'═' * BOX_WIDTH}╝{Colors.ENDC}",
+    ])
+
+# 安装横幅（颜色设置确定后预先生成）
+BANNER = _box([
+    _box_line(),
+    _box_line('Flask应用 V3版本 - 一键自动化安装', Colors.YELLOW),
+    _box_line(),
+    _box_line('✓ 自动检测环境', Colors.GREEN),
+    _box_line('✓ 自动配置国内镜像源', Colors.GREEN),
+    _box_line('✓ 自动安装依赖', Colors.GREEN),
+    _box_line('✓ 自动配置Playwright', Colors.GREEN),
+    _box_line('✓ 自动设置Docker环境', Colors.GREEN),
+    _box_line(),
+    _box_line('适用于低配置服务器 (1核2G)', Colors.YELLOW),
+    _box_line(),
+])
+
 # 辅助函数
 def print_banner():
-    banner = f"""
-{Colors.BLUE}╔═══════════════════════════════════════════════════════════════╗
-║                                                               ║
-║  {Colors.YELLOW}Flask应用 V3版本 - 一键自动化安装{Colors.BLUE}                         ║
-║                                                               ║
-║  {Colors.GREEN}✓ 自动检测环境{Colors.BLUE}                                           ║
-║  {Colors.GREEN}✓ 自动配置国内镜像源{Colors.BLUE}                                     ║
-║  {Colors.GREEN}✓ 自动安装依赖{Colors.BLUE}                                           ║
-║  {Colors.GREEN}✓ 自动配置Playwright{Colors.BLUE}                                    ║
-║  {Colors.GREEN}✓ 自动设置Docker环境{Colors.BLUE}                                    ║
-║                                                               ║
-║  {Colors.YELLOW}适用于低配置服务器 (1核2G){Colors.BLUE}                               ║
-║                                                               ║
-╚═══════════════════════════════════════════════════════════════╝{Colors.ENDC}
-"""
-    print(banner)
+    print(f"\n{BANNER}\n")
 
 def print_step(step_num, total_steps, message):
     print(f"\n{Colors.BLUE}[{step_num}/{total_steps}] {Colors.YELLOW}{message}{Colors.ENDC}")
@@ -109,10 +182,15 @@ def print_warning(message):
 def print_error(message):
     print(f"{Colors.RED}✗ {message}{Colors.ENDC}")
 
-def run_command(command, shell=True, check=True, cwd=None, env=None):
-    """运行命令并返回结果"""
+def run_command(command, shell=False, check=True, cwd=None, env=None):
+    """运行命令并返回结果
+
+    command可以是参数列表或字符串，字符串会用shlex拆分，默认不经过shell直接执行。
+    """
+    if isinstance(command, str) and not shell:
+        command = shlex.split(command, posix=not IS_WINDOWS)
     try:
-        logger.info(f"执行命令: {command}")
+        logger.info(f"执行命令: {command if isinstance(command, str) else subprocess.list2cmdline(command)}")
         result = subprocess.run(
             command,
             shell=shell,
@@ -129,9 +207,47 @@ def run_command(command, shell=True, check=True, cwd=None, env=None):
         logger.error(f"命令执行失败: {e}")
         logger.error(f"错误输出: {e.stderr}")
         return e
+    except OSError as e:
+        # 不经过shell时命令不存在会直接抛出异常，统一转换为失败结果
+        logger.error(f"命令执行失败: {e}")
+        return subprocess.CompletedProcess(command, 127, stdout='', stderr=str(e))
+
+async def run_command_async(command, log_path, env=None, tail_lines=50):
+    """异步运行耗时较长的命令，输出追加到单独的日志文件，避免并发任务的输出互相穿插
 
+    返回的结果中stderr只保留最后tail_lines行输出，用于失败时的错误提示。
+    """
+    logger.info(f"执行命令: {subprocess.list2cmdline(command)} (输出: {log_path})")
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=STREAM_LIMIT
+        )
+    except OSError as e:
+        logger.error(f"命令执行失败: {e}")
+        return subprocess.CompletedProcess(command, 127, stdout='', stderr=str(e))
+    
+    tail = deque(maxlen=tail_lines)
+    with open(log_path, 'ab') as log_file:
+        async for line in process.stdout:
+            log_file.write(line)
+            tail.append(line)
+    returncode = await process.wait()
+    return subprocess.CompletedProcess(command, returncode, stdout='', stderr=b''.join(tail).decode('utf-8', 'replace'))
+
+@lru_cache(maxsize=1)
 def get_system_memory():
     """获取系统内存大小（GB）"""
+    # 优先使用psutil（安装依赖前可能尚不可用）
+    try:
+        import psutil
+        return psutil.virtual_memory().total / (1024**3)
+    except Exception:
+        pass
+    
     try:
         if IS_WINDOWS:
             import ctypes
@@ -157,10 +273,10 @@ def get_system_memory():
         elif IS_LINUX:
             with open('/proc/meminfo', 'r') as f:
                 for line in f:
-                    if 'MemTotal' in line:
+                    if line.startswith('MemTotal'):
                         return int(line.split()[1]) / (1024**2)
         elif IS_MAC:
-            result = run_command('sysctl -n hw.memsize')
+            result = run_command(['sysctl', '-n', 'hw.memsize'])
             if result.returncode == 0:
                 return int(result.stdout.strip()) / (1024**3)
     except Exception as e:
@@ -169,6 +285,7 @@ def get_system_memory():
     # 如果无法获取，返回默认值
     return 4.0
 
+@lru_cache(maxsize=1)
 def is_running_in_docker():
     """检测是否在Docker容器中运行"""
     try:
@@ -180,52 +297,126 @@ def is_running_in_docker():
         except:
             return False
 
+@lru_cache(maxsize=1)
 def check_python_version():
     """检查Python版本是否满足要求"""
-    python_version = tuple(map(int, platform.python_version().split('.')[:2]))
+    python_version = tuple(map(int, PLATFORM.python_version.split('.')[:2]))
     if python_version < (3, 8):
-        print_error(f"Python版本过低: {platform.python_version()}")
+        print_error(f"Python版本过低: {PLATFORM.python_version}")
         print_warning("需要Python 3.8或更高版本")
         return False
-    print_success(f"Python版本检查通过: {platform.python_version()}")
+    print_success(f"Python版本检查通过: {PLATFORM.python_version}")
     return True
 
+def is_mirror_probe_fresh():
+    """上次镜像测速是否在MIRROR_PROBE_MAX_AGE秒以内"""
+    try:
+        return time.time() - os.path.getmtime(MIRROR_PROBE_STAMP_PATH) < MIRROR_PROBE_MAX_AGE
+    except OSError:
+        return False
+
+def record_mirror_probe():
+    """记录镜像测速时间"""
+    try:
+        os.makedirs(os.path.dirname(MIRROR_PROBE_STAMP_PATH), exist_ok=True)
+        with open(MIRROR_PROBE_STAMP_PATH, 'w', encoding='utf-8') as f:
+            f.write(datetime.now().isoformat())
+    except OSError as e:
+        logger.warning(f"记录镜像测速时间失败: {e}")
+
 def setup_pip_mirror():
     """设置pip国内镜像源"""
     try:
-        # 测试各个镜像源的速度
+        # pip.conf已指向已知镜像且最近测过速时，跳过测速
+        configured_url = get_configured_index_url()
+        if configured_url in PIP_MIRRORS.values() and is_mirror_probe_fresh():
+            print_success(f"pip镜像源已配置，跳过测速: {configured_url}")
+            return True
+        
+        # 并发测试各个镜像源的速度
         fastest_mirror = None
         best_time = float('inf')
         
-        for name, url in PIP_MIRRORS.items():
-            if name == 'default':
-                continue
-                
+        def probe(name, url):
+            # 只测量连接和首字节时间：优先HEAD，不支持HEAD的镜像改用只取1字节的GET
             start_time = time.time()
             try:
-                with urllib.request.urlopen(url, timeout=3) as response:
-                    if response.status == 200:
-                        elapsed = time.time() - start_time
-                        logger.info(f"镜像源 {name} 响应时间: {elapsed:.2f}秒")
-                        if elapsed < best_time:
-                            best_time = elapsed
-                            fastest_mirror = name
-            except Exception as e:
-                logger.warning(f"镜像源 {name} 测试失败: {e}")
+                request = urllib.request.Request(url, method='HEAD')
+                with urllib.request.urlopen(request, timeout=MIRROR_PROBE_TIMEOUT) as response:
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                if e.code not in (405, 501):
+                    raise
+                request = urllib.request.Request(url, headers={'Range': 'bytes=0-0'})
+                with urllib.request.urlopen(request, timeout=MIRROR_PROBE_TIMEOUT) as response:
+                    status = response.status
+            if status not in (200, 206):
+                raise RuntimeError(f"HTTP {status}")
+            return name, time.time() - start_time
+        
+        mirrors = {name: url for name, url in PIP_MIRRORS.items() if name != 'default'}
+        executor = ThreadPoolExecutor(max_workers=len(mirrors))
+        try:
+            futures = {executor.submit(probe, name, url): name for name, url in mirrors.items()}
+            responded = 0
+            try:
+                for future in as_completed(futures, timeout=MIRROR_PROBE_TIMEOUT):
+                    try:
+                        name, elapsed = future.result()
+                    except Exception as e:
+                        logger.warning(f"镜像源 {futures[future]} 测试失败: {e}")
+                        continue
+                    logger.info(f"镜像源 {name} 响应时间: {elapsed:.2f}秒")
+                    if elapsed < best_time:
+                        best_time = elapsed
+                        fastest_mirror = name
+                    responded += 1
+                    # 已有足够的镜像响应，不再等待更慢的镜像
+                    if responded >= MIRROR_PROBE_ENOUGH:
+                        break
+            except FuturesTimeoutError:
+                logger.warning("部分镜像源测试超时")
+        finally:
+            executor.shutdown(wait=False)
         
         if fastest_mirror:
             mirror_url = PIP_MIRRORS[fastest_mirror]
             print_success(f"选择最快的镜像源: {fastest_mirror} ({mirror_url})")
+            record_mirror_probe()
         else:
             mirror_url = PIP_MIRRORS['aliyun']  # 默认使用阿里云
             print_warning(f"无法测试镜像源速度，使用默认镜像: 阿里云 ({mirror_url})")
         
+        new_content = f"[global]\nindex-url = {mirror_url}\ntrusted-host = {mirror_url.split('/')[2]}\n"
+        
+        # 内容未变化时不重写
+        try:
+            with open(PIP_CONF_PATH, 'r', encoding='utf-8') as f:
+                if f.read() == new_content:
+                    print_success(f"pip镜像源配置未变化: {mirror_url}")
+                    return True
+        except OSError:
+            pass
+        
         # 创建pip配置目录
-        os.makedirs(os.path.dirname(PIP_CONF_PATH), exist_ok=True)
+        pip_conf_dir = os.path.dirname(PIP_CONF_PATH)
+        os.makedirs(pip_conf_dir, exist_ok=True)
         
-        # 写入pip配置文件
-        with open(PIP_CONF_PATH, 'w', encoding='utf-8') as f:
-            f.write(f"[global]\nindex-url = {mirror_url}\ntrusted-host = {mirror_url.split('/')[2]}\n")
+        # 临时文件的权限为0600，替换后沿用原配置文件的权限，没有原文件时使用0644
+        try:
+            conf_mode = stat.S_IMODE(os.stat(PIP_CONF_PATH).st_mode)
+        except OSError:
+            conf_mode = 0o644
+        
+        # 先写入临时文件再替换，避免中断时留下不完整的配置
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=pip_conf_dir, delete=False) as tf:
+            tf.write(new_content)
+        try:
+            os.chmod(tf.name, conf_mode)
+            os.replace(tf.name, PIP_CONF_PATH)
+        except OSError:
+            os.unlink(tf.name)
+            raise
         
         print_success(f"已配置pip镜像源: {mirror_url}")
         return True
@@ -247,8 +438,8 @@ def create_virtual_env():
                 print_warning("将使用现有虚拟环境")
                 return True
         
-        print_step(3, 10, "创建Python虚拟环境...")
-        result = run_command(f"{PYTHON_CMD} -m venv {VENV_DIR}")
+        print_step(3, 9, "创建Python虚拟环境...")
+        result = run_command([PYTHON_CMD, '-m', 'venv', VENV_DIR])
         
         if result.returncode == 0:
             print_success(f"虚拟环境创建成功: {VENV_DIR}")
@@ -269,89 +460,198 @@ def get_venv_python():
         return os.path.join(VENV_DIR, 'bin', 'python')
 
 def get_venv_pip():
-    """获取虚拟环境中的pip命令"""
+    """获取虚拟环境中的pip命令参数列表"""
+    return [get_venv_python(), '-m', 'pip']
+
+def get_pip_env():
+    """获取pip安装使用的环境变量：启用项目内的wheel缓存并优先使用二进制包"""
+    return {
+        **os.environ,
+        'PIP_CACHE_DIR': PIP_CACHE_DIR,
+        'PIP_DISABLE_PIP_VERSION_CHECK': '1',
+        'PIP_PREFER_BINARY': '1',
+        'UV_CACHE_DIR': UV_CACHE_DIR,
+    }
+
+def get_configured_index_url():
+    """读取pip.conf中配置的镜像地址，未配置时返回None"""
+    if not os.path.exists(PIP_CONF_PATH):
+        return None
+    parser = configparser.ConfigParser()
+    try:
+        parser.read(PIP_CONF_PATH, encoding='utf-8')
+    except configparser.Error:
+        return None
+    return parser.get('global', 'index-url', fallback=None)
+
+def file_sha256(path):
+    """计算文件内容的SHA-256"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def read_marker(path):
+    """读取标记文件内容，不存在时返回None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def write_marker(path, value):
+    """写入标记文件"""
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(value)
+    except OSError as e:
+        logger.warning(f"写入标记文件失败: {path}: {e}")
+
+def get_pinned_requirement(requirements_path, name):
+    """从依赖文件中取出指定包的版本约束，未找到时只返回包名"""
+    pattern = re.compile(rf'^{re.escape(name)}\s*([=<>~!]=|$)', re.IGNORECASE)
+    with open(requirements_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            requirement = line.split('#', 1)[0].strip()
+            if pattern.match(requirement):
+                return requirement
+    return name
+
+async def _install_deps_async(requirements_path, requirements_hash):
+    """安装项目依赖，输出写入DEPS_LOG_PATH"""
+    venv_pip = get_venv_pip()
+    pip_env = get_pip_env()
+    
+    print_step(5, 9, "安装项目依赖...")
+    # requirements_v3.txt已包含black，依赖与格式化工具在同一次pip调用中安装
+    # 如果系统安装了uv，使用uv并行解析和安装
+    uv_path = shutil.which('uv')
+    if uv_path:
+        index_url = get_configured_index_url()
+        index_args = ['--index-url', index_url] if index_url else []
+        logger.info(f"检测到uv，使用uv安装依赖: {uv_path}")
+        result = await run_command_async(
+            [uv_path, 'pip', 'install', '--python', get_venv_python(), *index_args, '-r', requirements_path],
+            DEPS_LOG_PATH,
+            env=pip_env
+        )
+    else:
+        # 跳过逐文件编译.pyc，优先使用wheel避免源码构建
+        result = await run_command_async(
+            [*venv_pip, 'install', *PIP_QUIET_FLAGS, '--prefer-binary', '--no-compile', '-r', requirements_path],
+            DEPS_LOG_PATH,
+            env=pip_env
+        )
+    
+    if result.returncode == 0:
+        write_marker(REQ_HASH_PATH, requirements_hash)
+        print_success("依赖安装完成")
+        return True
+    else:
+        print_error(f"依赖安装失败: {result.stderr}")
+        return False
+
+async def _install_pw_async(requirements_hash):
+    """安装Playwright浏览器及系统依赖，输出写入PW_LOG_PATH"""
     venv_python = get_venv_python()
-    return f'"{venv_python}" -m pip'
+    
+    print_step(6, 9, "安装Playwright...")
+    result = await run_command_async([venv_python, '-m', 'playwright', 'install', 'chromium'], PW_LOG_PATH)
+    
+    if result.returncode == 0:
+        print_success("Playwright安装成功")
+        
+        # 安装系统依赖
+        if not IS_WINDOWS:
+            print_step(7, 9, "安装Playwright系统依赖...")
+            result = await run_command_async([venv_python, '-m', 'playwright', 'install-deps', 'chromium'], PW_LOG_PATH)
+            
+            if result.returncode == 0:
+                print_success("Playwright系统依赖安装成功")
+            else:
+                print_warning(f"Playwright系统依赖安装失败，可能需要手动安装: {result.stderr}")
+                return True
+        
+        write_marker(PW_MARKER_PATH, requirements_hash)
+        return True
+    else:
+        print_error(f"Playwright安装失败: {result.stderr}")
+        return False
+
+async def _install_packages_async(requirements_path, requirements_hash, install_deps, install_pw):
+    """并发执行依赖安装和浏览器下载"""
+    tasks = [
+        _install_deps_async(requirements_path, requirements_hash) if install_deps else _done(),
+        _install_pw_async(requirements_hash) if install_pw else _done(),
+    ]
+    dep_ok, pw_ok = await asyncio.gather(*tasks)
+    return dep_ok, pw_ok
 
-def install_dependencies():
-    """安装项目依赖"""
+async def _done():
+    return True
+
+def install_packages():
+    """安装项目依赖和Playwright浏览器
+
+    两者都以网络下载为主，互不依赖，因此并发执行；各自的输出写入单独的日志文件。
+    返回(依赖是否安装成功, Playwright是否安装成功)。
+    """
     try:
         venv_pip = get_venv_pip()
+        pip_env = get_pip_env()
         
-        # 升级pip
-        print_step(4, 10, "升级pip...")
-        run_command(f"{venv_pip} install --upgrade pip")
-        print_success("pip升级完成")
-        
-        # 安装依赖
         requirements_path = os.path.join(PROJECT_ROOT, 'requirements_v3.txt')
         if not os.path.exists(requirements_path):
             print_error(f"依赖文件不存在: {requirements_path}")
-            return False
+            return False, False
         
-        print_step(5, 10, "安装项目依赖...")
-        result = run_command(f"{venv_pip} install -r {requirements_path}")
+        # 依赖文件未变化且已安装的包完整时跳过安装
+        requirements_hash = file_sha256(requirements_path)
+        install_deps = True
+        if read_marker(REQ_HASH_PATH) == requirements_hash:
+            if run_command([*venv_pip, 'check'], check=False).returncode == 0:
+                print_success("依赖文件未变化，跳过依赖安装")
+                install_deps = False
         
-        if result.returncode == 0:
-            print_success("依赖安装完成")
-            return True
-        else:
-            print_error(f"依赖安装失败: {result.stderr}")
-            return False
-    except Exception as e:
-        logger.error(f"安装依赖失败: {e}")
-        print_error(f"安装依赖时出错: {e}")
-        return False
-
-def install_playwright():
-    """安装Playwright及浏览器"""
-    try:
-        venv_python = get_venv_python()
+        # 当前依赖版本的浏览器已安装过则跳过下载
+        install_pw = read_marker(PW_MARKER_PATH) != requirements_hash
+        if not install_pw:
+            print_success("Playwright浏览器已安装，跳过")
         
-        print_step(6, 10, "安装Playwright...")
+        if install_deps:
+            # 升级pip（pip自升级需单独执行）
+            print_step(4, 9, "升级pip...")
+            run_command([*venv_pip, 'install', *PIP_QUIET_FLAGS, '--upgrade', 'pip'], env=pip_env)
+            print_success("pip升级完成")
+            
+            # 先单独安装Playwright命令行（不含依赖），浏览器下载即可与其余依赖的安装同时进行
+            if install_pw:
+                run_command(
+                    [*venv_pip, 'install', *PIP_QUIET_FLAGS, '--no-deps', get_pinned_requirement(requirements_path, 'playwright')],
+                    env=pip_env
+                )
         
-        # 安装Playwright
-        result = run_command(f"{venv_python} -m playwright install chromium")
+        if not install_deps and not install_pw:
+            return True, True
         
-        if result.returncode == 0:
-            print_success("Playwright安装成功")
-            
-            # 安装系统依赖
-            if not IS_WINDOWS:
-                print_step(7, 10, "安装Playwright系统依赖...")
-                result = run_command(f"{venv_python} -m playwright install-deps chromium")
-                
-                if result.returncode == 0:
-                    print_success("Playwright系统依赖安装成功")
-                else:
-                    print_warning(f"Playwright系统依赖安装失败，可能需要手动安装: {result.stderr}")
-            
-            return True
-        else:
-            print_error(f"Playwright安装失败: {result.stderr}")
-            return False
+        dep_ok, pw_ok = asyncio.run(_install_packages_async(requirements_path, requirements_hash, install_deps, install_pw))
+        logger.info(f"安装日志: 依赖 {DEPS_LOG_PATH}，Playwright {PW_LOG_PATH}")
+        return dep_ok, pw_ok
     except Exception as e:
-        logger.error(f"安装Playwright失败: {e}")
-        print_error(f"安装Playwright时出错: {e}")
-        return False
+        logger.error(f"安装依赖失败: {e}")
+        print_error(f"安装依赖时出错: {e}")
+        return False, False
 
 def format_code():
-    """使用Black格式化代码"""
+    """使用Black格式化代码（Black已随项目依赖安装）"""
     try:
-        venv_pip = get_venv_pip()
-        
-        # 安装Black
-        print_step(8, 10, "安装Black代码格式化工具...")
-        run_command(f"{venv_pip} install black")
-        
         # 格式化代码
         venv_python = get_venv_python()
-        print_step(9, 10, "格式化代码...")
+        print_step(8, 9, "格式化代码...")
         
-        python_files = [f for f in os.listdir(PROJECT_ROOT) if f.endswith('.py')]
-        for py_file in python_files:
-            file_path = os.path.join(PROJECT_ROOT, py_file)
-            run_command(f'"{venv_python}" -m black "{file_path}"')
+        # 一次调用Black格式化全部文件，避免每个文件都重新启动解释器
+        with os.scandir(PROJECT_ROOT) as entries:
+            python_files = [entry.path for entry in entries if entry.is_file() and entry.name.endswith('.py')]
+        if python_files:
+            run_command([venv_python, '-m', 'black', *python_files])
         
         print_success("代码格式化完成")
         return True
@@ -360,14 +660,32 @@ def format_code():
         print_warning(f"格式化代码时出错: {e}")
         return True  # 非关键步骤，失败也继续
 
+def compile_entry_modules():
+    """仅预编译应用入口模块，需在格式化代码之后执行，否则Black改写文件会使.pyc立即失效"""
+    try:
+        run_command([get_venv_python(), '-m', 'compileall', '-q', *(os.path.join(PROJECT_ROOT, m) for m in ENTRY_MODULES)])
+    except Exception as e:
+        logger.warning(f"预编译入口模块失败: {e}")
+
 def check_docker_environment():
     """检查Docker环境"""
     try:
-        print_step(10, 10, "检查Docker环境...")
+        print_step(9, 9, "检查Docker环境...")
+        
+        # 并发执行互不依赖的检查命令
+        commands = {
+            'docker': ['docker', '--version'],
+            'docker_compose': ['docker-compose', '--version'],
+        }
+        if IS_LINUX:
+            commands['service'] = ['systemctl', 'is-active', 'docker']
+        with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+            futures = {name: executor.submit(run_command, cmd, check=False) for name, cmd in commands.items()}
+            results = {name: future.result() for name, future in futures.items()}
         
         # 检查Docker是否安装
-        docker_result = run_command("docker --version", check=False)
-        docker_compose_result = run_command("docker-compose --version", check=False)
+        docker_result = results['docker']
+        docker_compose_result = results['docker_compose']
         
         if docker_result.returncode == 0:
             print_success(f"Docker已安装: {docker_result.stdout.strip()}")
@@ -382,7 +700,7 @@ def check_docker_environment():
             
             # 检查Docker服务状态
             if IS_LINUX:
-                service_result = run_command("systemctl is-active docker", check=False)
+                service_result = results['service']
                 if service_result.returncode == 0 and service_result.stdout.strip() == 'active':
                     print_success("Docker服务正在运行")
                 else:
@@ -410,59 +728,57 @@ def generate_summary():
     SYSTEM_INFO['is_docker'] = is_running_in_docker()
     SYSTEM_INFO['is_low_spec'] = SYSTEM_INFO['cpu_count'] <= 1 or SYSTEM_INFO['memory_gb'] < 4
     
-    summary = f"""
-{Colors.BLUE}╔═══════════════════════════════════════════════════════════════╗
-║                                                               ║
-║  {Colors.YELLOW}安装完成摘要{Colors.BLUE}                                             ║
-║                                                               ║
-║  {Colors.GREEN}系统信息:{Colors.BLUE}                                                 ║
-║    操作系统: {SYSTEM_INFO['os']} {SYSTEM_INFO['os_version']}                      ║
-║    Python版本: {platform.python_version()}                                ║
-║    CPU核心数: {SYSTEM_INFO['cpu_count']}                                      ║
-║    内存大小: {SYSTEM_INFO['memory_gb']:.1f} GB                                ║
-║    Docker环境: {'已安装' if SYSTEM_INFO.get('docker_version') else '未安装'}                                    ║
-║    低配置模式: {'是' if SYSTEM_INFO['is_low_spec'] else '否'}                                      ║
-║                                                               ║
-║  {Colors.GREEN}安装路径:{Colors.BLUE}                                                 ║
-║    项目目录: {PROJECT_ROOT}                    ║
-║    虚拟环境: {VENV_DIR}                        ║
-║                                                               ║
-║  {Colors.GREEN}启动应用:{Colors.BLUE}                                                 ║
-║    {Colors.YELLOW}python start_app_v3.py{Colors.BLUE}                                     ║
-║                                                               ║
-╚═══════════════════════════════════════════════════════════════╝{Colors.ENDC}
-"""
-    print(summary)
+    summary = _box([
+        _box_line(),
+        _box_line('安装完成摘要', Colors.YELLOW),
+        _box_line(),
+        _box_line('系统信息:', Colors.GREEN),
+        _box_line(f"操作系统: {SYSTEM_INFO['os']} {SYSTEM_INFO['os_version']}", indent=4),
+        _box_line(f"Python版本: {PLATFORM.python_version}", indent=4),
+        _box_line(f"CPU核心数: {SYSTEM_INFO['cpu_count']}", indent=4),
+        _box_line(f"内存大小: {SYSTEM_INFO['memory_gb']:.1f} GB", indent=4),
+        _box_line(f"Docker环境: {'已安装' if SYSTEM_INFO.get('docker_version') else '未安装'}", indent=4),
+        _box_line(f"低配置模式: {'是' if SYSTEM_INFO['is_low_spec'] else '否'}", indent=4),
+        _box_line(),
+        _box_line('安装路径:', Colors.GREEN),
+        _box_line(f"项目目录: {PROJECT_ROOT}", indent=4),
+        _box_line(f"虚拟环境: {VENV_DIR}", indent=4),
+        _box_line(),
+        _box_line('启动应用:', Colors.GREEN),
+        _box_line('python start_app_v3.py', Colors.YELLOW, indent=4),
+        _box_line(),
+    ])
+    print(f"\n{summary}\n")
 
 def main():
     """主函数"""
     print_banner()
     
     # 步骤1: 检查Python版本
-    print_step(1, 10, "检查Python版本...")
+    print_step(1, 9, "检查Python版本...")
     if not check_python_version():
         sys.exit(1)
     
     # 步骤2: 设置pip镜像源
-    print_step(2, 10, "设置pip国内镜像源...")
+    print_step(2, 9, "设置pip国内镜像源...")
     setup_pip_mirror()
     
     # 步骤3: 创建虚拟环境
     if not create_virtual_env():
         sys.exit(1)
     
-    # 步骤4-5: 安装依赖
-    if not install_dependencies():
+    # 步骤4-7: 安装依赖和Playwright（并发执行）
+    dep_ok, pw_ok = install_packages()
+    if not dep_ok:
         sys.exit(1)
-    
-    # 步骤6-7: 安装Playwright
-    if not install_playwright():
+    if not pw_ok:
         print_warning("Playwright安装失败，但将继续安装过程")
     
-    # 步骤8-9: 格式化代码
+    # 步骤8: 格式化代码，完成后再预编译入口模块
     format_code()
+    compile_entry_modules()
     
-    # 步骤10: 检查Docker环境
+    # 步骤9: 检查Docker环境
     check_docker_environment()
     
     # 生成安装摘要
@@ -10,9 +10,12 @@ import os
 import sys
 import time
 import json
+import signal
+import asyncio
 import logging
 import platform
-import subprocess
+from collections import namedtuple
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Union, Any
 
@@ -40,23 +43,35 @@ logger = logging.getLogger("启动器")
 APP_SCRIPT = "app_v3.py"
 DEFAULT_PORT = 5000
 DEFAULT_HOST = "0.0.0.0"
+OUTPUT_CHUNK_SIZE = 65536  # 转发子进程输出的块大小（字节）
+
+# 平台信息快照
+PlatformSnapshot = namedtuple('PlatformSnapshot', ['os', 'os_version', 'python_version', 'cpu_count'])
+
+@lru_cache(maxsize=1)
+def _platform_snapshot():
+    """获取平台信息，运行期间不会变化，只探测一次"""
+    return PlatformSnapshot(
+        os=platform.system(),
+        os_version=platform.version(),
+        python_version=platform.python_version(),
+        cpu_count=os.cpu_count() or 1,
+    )
 
 # 系统信息分析
 def analyze_system():
     """分析系统资源并返回系统信息"""
+    snapshot = _platform_snapshot()
     system_info = {
-        "os": platform.system(),
-        "os_version": platform.version(),
-        "python_version": platform.python_version(),
-        "cpu_count": os.cpu_count() or 1,
+        "os": snapshot.os,
+        "os_version": snapshot.os_version,
+        "python_version": snapshot.python_version,
+        "cpu_count": snapshot.cpu_count,
         "is_docker": is_running_in_docker(),
     }
     
     # 使用psutil获取更详细的系统信息
     if HAS_PSUTIL:
-        # 获取CPU信息
-        system_info["cpu_percent"] = psutil.cpu_percent(interval=1)
-        
         # 获取内存信息
         memory = psutil.virtual_memory()
         system_info["total_memory_gb"] = memory.total / (1024 ** 3)
@@ -81,7 +96,9 @@ def is_running_in_docker():
     # 方法1: 检查cgroup
     try:
         with open('/proc/1/cgroup', 'r') as f:
-            return 'docker' in f.read() or 'kubepods' in f.read()
+            cgroup = f.read()
+        if 'docker' in cgroup or 'kubepods' in cgroup:
+            return True
     except:
         pass
     
@@ -158,7 +175,7 @@ def set_environment_variables(system_info):
     return env_vars
 
 # 启动应用
-def start_app(env_vars):
+async def start_app(env_vars):
     """使用优化的环境变量启动应用"""
     # 更新环境变量
     os.environ.update(env_vars)
@@ -189,7 +206,7 @@ def start_app(env_vars):
                 f"--threads={os.environ.get('GUNICORN_THREADS', '2')}",
                 f"--timeout={os.environ.get('GUNICORN_TIMEOUT', '120')}",
                 f"--bind={os.environ.get('HOST', DEFAULT_HOST)}:{os.environ.get('PORT', DEFAULT_PORT)}",
-                "app_v3:app"
+                "app_v3:create_app()"
             ]
         except ImportError:
             logger.warning("gunicorn未安装，使用Flask内置服务器")
@@ -201,24 +218,54 @@ def start_app(env_vars):
     # 启动应用
     try:
         logger.info(f"执行命令: {' '.join(cmd)}")
-        process = subprocess.Popen(
-            cmd,
-            env=os.environ.copy(),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True
+        # 环境变量已更新到os.environ，子进程直接继承，无需复制
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
         )
         
-        # 实时输出日志
-        for line in process.stdout:
-            print(line, end='')
+        # 收到中断信号时终止子进程
+        interrupted = False
         
-        # 等待进程结束
-        process.wait()
-        return process.returncode
-    except KeyboardInterrupt:
-        logger.info("接收到中断信号，正在关闭应用...")
-        return 0
+        def terminate_process():
+            if process.returncode is None:
+                try:
+                    process.terminate()
+                except ProcessLookupError:
+                    pass
+        
+        def on_signal():
+            nonlocal interrupted
+            interrupted = True
+            logger.info("接收到中断信号，正在关闭应用...")
+            terminate_process()
+        
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, on_signal)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        try:
+            # 实时输出日志：按块转发，不逐行处理
+            while True:
+                chunk = await process.stdout.read(OUTPUT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+            
+            # 等待进程结束
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            # 不支持add_signal_handler时（如Windows），Ctrl+C由asyncio.run取消本任务
+            logger.info("接收到中断信号，正在关闭应用...")
+            terminate_process()
+            await process.wait()
+            return 0
+        return 0 if interrupted else returncode
     except Exception as e:
         logger.error(f"启动应用时出错: {e}")
         return 1
@@ -250,7 +297,11 @@ def main():
             logger.info(f"  {key}: {value}")
         
         # 启动应用
-        return start_app(env_vars)
+        return asyncio.run(start_app(env_vars))
+    except KeyboardInterrupt:
+        # 旧版本Python的asyncio.run会直接抛出KeyboardInterrupt，子进程已在取消时终止
+        logger.info("接收到中断信号，正在关闭应用...")
+        return 0
     except Exception as e:
         logger.error(f"启动器出错: {e}")
         import traceback